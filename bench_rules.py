@@ -0,0 +1,351 @@
+"""Offline benchmark for label rule evaluation.
+
+Sweeps changed file counts, file pattern counts, glob/regex pattern mixes
+and team sizes one axis at a time and reports evaluations per second, CPU
+time per event and allocations per event. Allocations are the tracemalloc
+high-water mark in KiB on Python 3. Python 2.7 has no tracemalloc, so there
+each call runs in a forked child and the growth of its peak RSS is
+reported instead, which only resolves allocations of a few hundred KiB or
+more. Every configuration is first checked against the reference
+semantics, the original fnmatch loop from lambda_handler.
+
+The file listing is swept separately over patch sizes, comparing the peak
+memory of decoding a page with json.loads against pull_files' streaming
+parser, plain and gzipped, which must return the same filenames.
+
+    python bench_rules.py [--min-time SECONDS] [--quick]
+"""
+from __future__ import print_function
+
+from fnmatch import fnmatch
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import zlib
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+from pull_files import CHUNK_SIZE, FIELDS, JSONStream, PER_PAGE, iter_text
+from rules import evaluate_labels
+
+try:
+    import tracemalloc
+    process_time = time.process_time
+except ImportError:
+    # Python 2.7
+    tracemalloc = None
+    process_time = time.clock
+
+ALLOCATIONS = 'peak KiB' if tracemalloc is not None else 'peak RSS KiB'
+# ru_maxrss is in bytes on macOS and KiB elsewhere
+RSS_UNIT = 1024. if sys.platform == 'darwin' else 1.
+
+BASELINE = {'files': 100, 'patterns': 10, 'glob_ratio': 0.5, 'team_size': 10}
+SWEEPS = [
+    ('files', [10, 100, 300, 1000, 3000]),
+    ('patterns', [1, 10, 100, 300, 1000]),
+    ('glob_ratio', [1.0, 0.5, 0.0]),
+    ('team_size', [1, 10, 100, 1000]),
+]
+QUICK_SWEEPS = [
+    ('files', [10, 3000]),
+    ('patterns', [1, 1000]),
+    ('glob_ratio', [1.0, 0.0]),
+    ('team_size', [1, 1000]),
+]
+# Team members are spread over this many team labels, and the author is in
+# none of them, so every membership test scans the whole team
+TEAMS = 4
+AUTHOR = 'outsider'
+PATCH_KIB = [0, 16, 128, 512]
+QUICK_PATCH_KIB = [0, 512]
+EXTENSIONS = ['py', 'rb', 'js', 'css', 'md']
+
+
+def reference_labels(repo_config, author, filenames, base_branch, head_branch):
+    """Label evaluation exactly as lambda_handler originally did it."""
+    label_tests = {label: (author in users) for label, users
+                   in repo_config['team_labels'].items()}
+
+    for label, patterns in repo_config['file_pattern_labels'].items():
+        label_tests[label] = False
+
+        if isinstance(patterns, str):
+            patterns = [patterns]
+
+        for pattern in patterns:
+            if isinstance(pattern, str):
+                match = any(fnmatch(filename, pattern) for filename
+                            in filenames)
+            else:
+                match = any(pattern.match(filename) is not None for filename
+                            in filenames)
+
+            if match:
+                label_tests[label] = True
+                break
+
+    label_tests.update(
+        {label: fnmatch(base_branch, pattern) or label_tests.get(label, False)
+         for label, pattern in repo_config['base_branch_labels'].items()})
+    label_tests.update(
+        {label: fnmatch(head_branch, pattern) or label_tests.get(label, False)
+         for label, pattern in repo_config['head_branch_labels'].items()})
+
+    return label_tests
+
+
+# Both are timed, only evaluate_labels is checked against the reference
+EVALUATORS = [
+    ('reference', reference_labels),
+    ('compiled', evaluate_labels),
+]
+
+
+def make_filenames(count):
+    return ['dir{0}/sub{1}/file{2}.{3}'.format(
+        i % 20, i % 7, i, EXTENSIONS[i % len(EXTENSIONS)])
+        for i in range(count)]
+
+
+def make_config(patterns, glob_ratio, team_size):
+    """Build a repo config with a mix of matching and missing patterns.
+
+    Each of the TEAMS team labels gets team_size members.
+
+    One label always uses the single glob string form of
+    file_pattern_labels. The generated patterns are spread over the other
+    labels three at a time as lists, a lone trailing glob stays a string.
+    """
+    globs = int(round(patterns * glob_ratio))
+    file_patterns = []
+    for i in range(patterns):
+        # Every other pattern points at a directory that never changes
+        directory = 'dir{0}'.format(i % 20 if i % 2 else 100 + i)
+        extension = EXTENSIONS[i % len(EXTENSIONS)]
+        if i < globs:
+            file_patterns.append('{0}/*.{1}'.format(directory, extension))
+        else:
+            file_patterns.append(re.compile(
+                r'{0}/sub\d+/file\d+\.{1}$'.format(directory, extension)))
+
+    file_pattern_labels = {'files_single': 'dir0/*.py'}
+    for start in range(0, patterns, 3):
+        chunk = file_patterns[start:start + 3]
+        if len(chunk) == 1 and isinstance(chunk[0], str):
+            chunk = chunk[0]
+        file_pattern_labels['files_{0}'.format(start)] = chunk
+
+    team_labels = {
+        'team_{0}'.format(team): ['user{0}_{1}'.format(team, i)
+                                  for i in range(team_size)]
+        for team in range(TEAMS)}
+    return {
+        'team_labels': team_labels,
+        'file_pattern_labels': file_pattern_labels,
+        'base_branch_labels': {'release': 'release/*'},
+        'head_branch_labels': {'feature': 'feature/*'},
+    }
+
+
+def iter_chunks(body, chunk_size):
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+class FakeResponse(object):
+    """Stands in for a streamed requests response, optionally gzipped."""
+
+    def __init__(self, body, compressed=False):
+        self.body = body
+        self.headers = {'Content-Encoding': 'gzip'} if compressed else {}
+        self.raw = self
+
+    def iter_content(self, chunk_size):
+        return iter_chunks(self.body, chunk_size)
+
+    def stream(self, amt, decode_content):
+        return iter_chunks(self.body, amt)
+
+
+def make_files_page(patch_kib):
+    line = '+' + 'x' * 62 + '\n'
+    patch = '@@ -0,0 +1 @@\n' + line * (patch_kib * 1024 // len(line))
+    files = []
+    for i, filename in enumerate(make_filenames(PER_PAGE)):
+        pfile = {'sha': '{0:040x}'.format(i), 'filename': filename,
+                 'status': 'modified', 'additions': 1, 'deletions': 0,
+                 'changes': 1, 'patch': patch}
+        if i % 10 == 0:
+            pfile['status'] = 'renamed'
+            pfile['previous_filename'] = 'old/' + filename
+        files.append(pfile)
+    return json.dumps(files).encode('utf-8')
+
+
+def full_decode(body):
+    return [{key: pfile[key] for key in FIELDS if key in pfile}
+            for pfile in json.loads(body.decode('utf-8'))]
+
+
+def lean_decode(body, compressed=False):
+    return list(JSONStream(iter_text(FakeResponse(body, compressed),
+                                     CHUNK_SIZE)).objects(FIELDS))
+
+
+def gzip_body(body):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+def run_listing(patch_sizes):
+    mismatches = 0
+    print()
+    print('{0:<12}{1:>8}  {2:<10}{3:>12}{4:>14}{5:>14}'.format(
+        'page of', 'patch KiB', 'decoder', 'page KiB', 'ms/page',
+        ALLOCATIONS))
+
+    for patch_kib in patch_sizes:
+        body = make_files_page(patch_kib)
+        compressed = gzip_body(body)
+        expected = full_decode(body)
+        decoders = [
+            ('json', lambda: full_decode(body)),
+            ('lean', lambda: lean_decode(body)),
+            ('lean gzip', lambda: lean_decode(compressed, compressed=True)),
+        ]
+        for name, decode in decoders:
+            if name != 'json' and decode() != expected:
+                mismatches += 1
+                print('MISMATCH: {0} with {1} KiB patches'.format(
+                    name, patch_kib))
+                continue
+
+            cpu_start = process_time()
+            decode()
+            cpu = process_time() - cpu_start
+
+            print('{0:<12}{1:>8}  {2:<10}{3:>12.1f}{4:>14.1f}{5:>14}'.format(
+                '{0} files'.format(PER_PAGE), patch_kib, name,
+                len(body) / 1024., cpu * 1e3, allocations(decode)))
+
+    return mismatches
+
+
+def rss_growth(func):
+    """Return how far one call to func raises peak RSS, in KiB.
+
+    The call runs in a forked child, so earlier calls don't hide its peak.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:
+        os.close(read_fd)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        func()
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write_fd, str((after - before) / RSS_UNIT).encode('ascii'))
+        os._exit(0)
+
+    os.close(write_fd)
+    growth = float(os.read(read_fd, 64))
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    return growth
+
+
+def allocations(func):
+    """Return the allocations of one call to func, formatted for printing."""
+    if tracemalloc is not None:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return '{0:.1f}'.format(peak / 1024.)
+
+    if resource is None or not hasattr(os, 'fork'):
+        return 'n/a'
+
+    # Forking alone grows RSS a little, by an amount that depends on the
+    # parent's heap, so measure that baseline right before every call
+    baseline = rss_growth(lambda: None)
+    return '{0:.1f}'.format(max(0., rss_growth(func) - baseline))
+
+
+def label_set(label_tests):
+    return set(label for label, applies in label_tests.items() if applies)
+
+
+def measure(evaluator, args, min_time):
+    """Return evaluations per second, CPU seconds and allocations per event."""
+    evaluator(*args)
+
+    runs = 0
+    wall_start = time.time()
+    cpu_start = process_time()
+    while True:
+        evaluator(*args)
+        runs += 1
+        wall = time.time() - wall_start
+        if wall >= min_time:
+            break
+    cpu = process_time() - cpu_start
+
+    return runs / wall, cpu / runs, allocations(lambda: evaluator(*args))
+
+
+def run(sweeps, min_time):
+    mismatches = 0
+    print('{0:<12}{1:>8}  {2:<10}{3:>12}{4:>14}{5:>14}'.format(
+        'axis', 'value', 'evaluator', 'evals/s', 'cpu us/event',
+        ALLOCATIONS))
+
+    for axis, values in sweeps:
+        for value in values:
+            params = dict(BASELINE, **{axis: value})
+            repo_config = make_config(params['patterns'],
+                                      params['glob_ratio'],
+                                      params['team_size'])
+            args = (repo_config, AUTHOR, make_filenames(params['files']),
+                    'release/78', 'feature/fix-X')
+
+            if (label_set(evaluate_labels(*args)) !=
+                    label_set(reference_labels(*args))):
+                mismatches += 1
+                print('MISMATCH: compiled with {0}'.format(params))
+                continue
+
+            for name, evaluator in EVALUATORS:
+                rate, cpu, allocated = measure(evaluator, args, min_time)
+                print('{0:<12}{1:>8}  {2:<10}{3:>12.1f}{4:>14.1f}{5:>14}'
+                      .format(axis, value, name, rate, cpu * 1e6, allocated))
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='seconds to spend timing each evaluator')
+    parser.add_argument('--quick', action='store_true',
+                        help='only run the ends of each sweep')
+    options = parser.parse_args()
+
+    mismatches = run(QUICK_SWEEPS if options.quick else SWEEPS,
+                     options.min_time)
+    mismatches += run_listing(QUICK_PATCH_KIB if options.quick else PATCH_KIB)
+    if mismatches:
+        print('{0} configurations disagree with the reference'.format(
+            mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
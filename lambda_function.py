@@ -1,11 +1,12 @@
 from __future__ import print_function
 
-from fnmatch import fnmatch
 from chainmap import ChainMap
 import json
 import os
 
 import config
+from pull_files import github_session, iter_pull_filenames
+from rules import evaluate_labels
 
 config.repos = {key.lower(): value for key, value in config.repos.items()}
 
@@ -94,50 +95,20 @@ def lambda_handler(event, context, debug=False):
         return
 
     gh = login(os.environ['GH_USER'], password=os.environ['GH_TOKEN'])
+    # Plain session for the file listing, github3 would decode every patch
+    session = github_session(os.environ['GH_USER'], os.environ['GH_TOKEN'])
 
     issue = gh.issue(base_repo_owner, base_repo, pr_id)
-    pr = gh.pull_request(base_repo_owner, base_repo, pr_id)
     head_repo = gh.repository(head_repo_owner, head_repo)
     head_commit = head_repo.commit(head_sha)
 
-    files_changed = pr.files()
+    files_changed = list(iter_pull_filenames(session, base_repo_owner,
+                                             base_repo, pr_id))
     current_labels = set(str(l) for l in issue.original_labels)
 
     # Calculate which labels to add and remove
-    # Team Labels
-    label_tests = {label: (author in users) for label, users
-                   in repo_config['team_labels'].items()}
-
-    # File Pattern Labels
-    for label, patterns in repo_config['file_pattern_labels'].items():
-        label_tests[label] = False
-
-        if isinstance(patterns, str):
-            patterns = [patterns]
-
-        for pattern in patterns:
-            if isinstance(pattern, str):
-                match = any(fnmatch(pfile.filename, pattern) for pfile
-                            in files_changed)
-            else:
-                match = any(pattern.match(pfile.filename) is not None for pfile
-                            in files_changed)
-
-            if match:
-                label_tests[label] = True
-                break
-
-        if label_tests[label]:
-            continue
-
-    # Base Branch Labels
-    label_tests.update(
-        {label: fnmatch(base_branch, pattern) or label_tests.get(label, False)
-         for label, pattern in repo_config['base_branch_labels'].items()})
-    # Head Branch Labels
-    label_tests.update(
-        {label: fnmatch(head_branch, pattern) or label_tests.get(label, False)
-         for label, pattern in repo_config['head_branch_labels'].items()})
+    label_tests = evaluate_labels(
+        repo_config, author, files_changed, base_branch, head_branch)
 
     # Find labels to remove:
     remove_labels = current_labels & set(label for label, to_add
@@ -151,7 +122,7 @@ def lambda_handler(event, context, debug=False):
     new_labels = (current_labels - remove_labels) | add_labels
 
     if new_labels != current_labels:
-        print('Changing labels on PR#{0}.'.format(pr.number))
+        print('Changing labels on PR#{0}.'.format(pr_id))
         if add_labels:
             print('Adding {0}'.format(', '.join(add_labels)))
         if remove_labels:
@@ -0,0 +1,288 @@
+"""Lean listing of the files changed in a pull request.
+
+github3's ``pr.files()`` decodes every field of every file, including the
+patch text, which can add up to tens of megabytes on generated-code or
+vendoring pull requests. This walks each page of the same API response as
+it streams in and only keeps the fields the label rules look at. Gzipped
+pages are decompressed at most a chunk at a time, so memory use stays
+bounded by the chunk size rather than by the size of the diff.
+"""
+from __future__ import print_function
+
+import codecs
+import json
+import re
+import zlib
+
+API_URL = 'https://api.github.com/repos/{0}/{1}/pulls/{2}/files'
+# 100 is the most the files endpoint returns per page
+PER_PAGE = 100
+CHUNK_SIZE = 64 * 1024
+FIELDS = ('filename', 'previous_filename')
+# Connect and read timeouts in seconds, so a stalled page fails the event
+# instead of running into the Lambda timeout
+TIMEOUT = (5, 30)
+
+# Sessions by credentials, shared across events in a warm container
+SESSIONS = {}
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+# A key and its colon, when the key needs no unescaping
+KEY = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:')
+# A whole object member whose key and value need no unescaping, which is
+# nearly every member GitHub sends apart from the patch
+MEMBER = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*'
+                    r'(?:"([^"\\]*)"|-?[0-9][0-9.eE+-]*|true|false|null)'
+                    r'[ \t\n\r]*([,}])')
+DECODER = json.JSONDecoder()
+TEXT = type(u'')
+
+CONTAINER_BODY = re.compile(r'[^"\[\]{}]*')
+SCALAR = re.compile(r'[^,\]}\s]*')
+
+
+class JSONStream(object):
+    """Minimal pull parser over text chunks of a JSON array of objects.
+
+    Consumed text is dropped every time more is read, so only the current
+    chunk and any unfinished token are held in memory. Objects that fit in
+    the buffer are decoded whole, longer ones are read member by member and
+    values that are skipped are never assembled, however large they are.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = ''
+        self._pos = 0
+
+    def _fill(self):
+        for chunk in self._chunks:
+            if chunk:
+                self._buf = self._buf[self._pos:] + chunk
+                self._pos = 0
+                return True
+        return False
+
+    def _advance(self, regex):
+        """Move past everything regex matches, across chunk boundaries."""
+        while True:
+            self._pos = regex.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return
+
+    def _peek(self):
+        pos = WHITESPACE.match(self._buf, self._pos).end()
+        if pos < len(self._buf):
+            self._pos = pos
+            return self._buf[pos]
+        self._advance(WHITESPACE)
+        if self._pos == len(self._buf):
+            raise ValueError('Unexpected end of JSON input')
+        return self._buf[self._pos]
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError('Expected {!r} at {!r}'.format(
+                char, self._buf[self._pos:self._pos + 20]))
+        self._pos += 1
+
+    def _read_string(self):
+        if self._peek() != '"':
+            raise ValueError('Expected a string at {!r}'.format(
+                self._buf[self._pos:self._pos + 20]))
+        while True:
+            match = STRING.match(self._buf, self._pos)
+            if match:
+                self._pos = match.end()
+                value = match.group()
+                if '\\' in value:
+                    return json.loads(value)
+                return value[1:-1]
+            if not self._fill():
+                raise ValueError('Unterminated JSON string')
+
+    def _escaped(self, end, escaped):
+        """Return whether the character at end is escaped by a backslash.
+
+        Backslashes are counted back to _pos, escaped says whether the text
+        consumed before _pos ended in an odd run of them.
+        """
+        start = end
+        while start > self._pos and self._buf[start - 1] == '\\':
+            start -= 1
+        if start == self._pos:
+            return escaped != ((end - start) % 2 == 1)
+        return (end - start) % 2 == 1
+
+    def _skip_string(self):
+        self._pos += 1
+        escaped = False
+        while True:
+            end = self._buf.find('"', self._pos)
+            if end == -1:
+                escaped = self._escaped(len(self._buf), escaped)
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise ValueError('Unterminated JSON string')
+            elif self._escaped(end, escaped):
+                self._pos = end + 1
+                escaped = False
+            else:
+                self._pos = end + 1
+                return
+
+    def _skip_value(self):
+        char = self._peek()
+        if char == '"':
+            self._skip_string()
+        elif char in '[{':
+            depth = 0
+            while True:
+                char = self._buf[self._pos]
+                if char == '"':
+                    self._skip_string()
+                else:
+                    self._pos += 1
+                    depth += 1 if char in '[{' else -1
+                    if not depth:
+                        return
+                self._advance(CONTAINER_BODY)
+                if self._pos == len(self._buf):
+                    raise ValueError('Unexpected end of JSON input')
+        else:
+            self._advance(SCALAR)
+
+    def _read_object(self, fields):
+        """Read one object member by member, keeping the given fields."""
+        self._expect('{')
+        obj = {}
+        if self._peek() == '}':
+            self._pos += 1
+            return obj
+
+        while True:
+            match = MEMBER.match(self._buf, self._pos)
+            if match:
+                self._pos = match.end()
+                key, value, separator = match.groups()
+                if value is not None and key in fields:
+                    obj[key] = value
+            else:
+                # Escapes, containers or a member cut off at the end of the
+                # buffer
+                match = KEY.match(self._buf, self._pos)
+                if match:
+                    self._pos = match.end()
+                    key = match.group(1)
+                else:
+                    key = self._read_string()
+                    self._expect(':')
+                # Wanted fields can be null, skip those like the rest
+                if key in fields and self._peek() == '"':
+                    obj[key] = self._read_string()
+                else:
+                    self._skip_value()
+                separator = self._peek()
+                if separator not in ',}':
+                    raise ValueError('Expected , or }} at {!r}'.format(
+                        self._buf[self._pos:self._pos + 20]))
+                self._pos += 1
+            if separator == '}':
+                return obj
+
+    def objects(self, fields):
+        """Yield a dict of the given fields for each object in the array."""
+        self._expect('[')
+        if self._peek() == ']':
+            return
+
+        while True:
+            # Objects that are already buffered in full are at most a chunk
+            # or so, decoding those in one go is much faster than member by
+            # member. Anything longer is streamed.
+            try:
+                pfile, end = DECODER.raw_decode(self._buf, self._pos)
+            except ValueError:
+                pfile = None
+            if isinstance(pfile, dict):
+                self._pos = end
+                yield {key: pfile[key] for key in fields
+                       if isinstance(pfile.get(key), TEXT)}
+            else:
+                yield self._read_object(fields)
+
+            if self._peek() != ',':
+                break
+            self._pos += 1
+            self._peek()
+        self._expect(']')
+
+
+def iter_bytes(response, chunk_size=CHUNK_SIZE):
+    """Yield the response body in pieces of at most chunk_size bytes.
+
+    iter_content() decompresses each chunk read off the wire in one go, and
+    a 64 KiB gzipped chunk of repetitive patch text can expand many times
+    over, so gzip is decoded here with a cap on the output instead.
+    """
+    if response.headers.get('Content-Encoding') != 'gzip':
+        for chunk in response.iter_content(chunk_size):
+            yield chunk
+        return
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in response.raw.stream(chunk_size, decode_content=False):
+        data = decompressor.decompress(chunk, chunk_size)
+        while data:
+            yield data
+            data = decompressor.decompress(decompressor.unconsumed_tail,
+                                           chunk_size)
+    yield decompressor.flush()
+
+
+def iter_text(response, chunk_size=CHUNK_SIZE):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in iter_bytes(response, chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def github_session(user, token):
+    """Return a requests session authenticated against the GitHub API."""
+    if (user, token) not in SESSIONS:
+        import requests
+
+        session = requests.Session()
+        session.auth = (user, token)
+        session.headers['Accept'] = 'application/vnd.github.v3+json'
+        # iter_bytes only knows how to cap the output of gzip
+        session.headers['Accept-Encoding'] = 'gzip'
+        SESSIONS[(user, token)] = session
+    return SESSIONS[(user, token)]
+
+
+def iter_pull_filenames(session, owner, repo, number):
+    """Yield the path of every file changed in a pull request.
+
+    Renamed files yield their previous path as well, so patterns matching
+    where a file was moved from still apply.
+    """
+    url = API_URL.format(owner, repo, number)
+    params = {'per_page': PER_PAGE}
+
+    while url:
+        response = session.get(url, params=params, stream=True,
+                               timeout=TIMEOUT)
+        try:
+            response.raise_for_status()
+            for pfile in JSONStream(iter_text(response)).objects(FIELDS):
+                for field in FIELDS:
+                    if field in pfile:
+                        yield pfile[field]
+        finally:
+            response.close()
+
+        # The next link already carries the query string
+        url = response.links.get('next', {}).get('url')
+        params = None
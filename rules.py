@@ -0,0 +1,57 @@
+from __future__ import print_function
+
+from fnmatch import fnmatch, translate
+import re
+
+# Translated glob patterns, shared across events in a warm container
+GLOB_MATCHERS = {}
+
+
+def compile_patterns(patterns):
+    """Turn a file_pattern_labels value into a list of match functions.
+
+    Glob strings are translated to regular expressions once per container,
+    so matching a file no longer goes through fnmatch for every file.
+    Globs match case-sensitively, which is what fnmatch does on Lambda's
+    Linux runtime. Pre-compiled regular expressions are used as-is.
+    """
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    matchers = []
+    for pattern in patterns:
+        if isinstance(pattern, str):
+            if pattern not in GLOB_MATCHERS:
+                GLOB_MATCHERS[pattern] = re.compile(translate(pattern)).match
+            matchers.append(GLOB_MATCHERS[pattern])
+        else:
+            matchers.append(pattern.match)
+    return matchers
+
+
+def evaluate_labels(repo_config, author, filenames, base_branch, head_branch):
+    """Return a dict mapping each configured label to whether it applies.
+
+    This does not talk to GitHub, so it can be run against any repo config
+    and list of changed filenames.
+    """
+    # Team Labels
+    label_tests = {label: (author in users) for label, users
+                   in repo_config['team_labels'].items()}
+
+    # File Pattern Labels
+    for label, patterns in repo_config['file_pattern_labels'].items():
+        label_tests[label] = any(
+            match(filename) is not None for match in compile_patterns(patterns)
+            for filename in filenames)
+
+    # Base Branch Labels
+    label_tests.update(
+        {label: fnmatch(base_branch, pattern) or label_tests.get(label, False)
+         for label, pattern in repo_config['base_branch_labels'].items()})
+    # Head Branch Labels
+    label_tests.update(
+        {label: fnmatch(head_branch, pattern) or label_tests.get(label, False)
+         for label, pattern in repo_config['head_branch_labels'].items()})
+
+    return label_tests
@@ -0,0 +1,182 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from pull_files import (FIELDS, TIMEOUT, JSONStream, iter_bytes,
+                        iter_pull_filenames, iter_text)
+
+FILES = [
+    {'sha': 'a1', 'filename': 'db/schema.rb', 'status': 'modified',
+     'additions': 1, 'deletions': 0, 'changes': 1,
+     'patch': '@@ -1 +1 @@\n-old\n+new "quoted" \\ back\\slash\n'},
+    {'sha': 'b2', 'filename': 'app/été/文件.js',
+     'status': 'renamed', 'previous_filename': 'old/été.js',
+     'additions': 0, 'deletions': 0, 'changes': 0},
+    {'sha': 'c3', 'filename': 'say "hi"\\there.txt',
+     'status': 'added', 'previous_filename': None,
+     'nested': {'list': [1, [2, {'x': ']}"'}], {}], 'obj': {'s': '{['}},
+     'empty': [], 'flags': [True, False, None], 'ratio': -1.5e3},
+    {},
+]
+
+
+def chunked(text, size):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def wanted(files):
+    return [{key: pfile[key] for key in FIELDS
+             if pfile.get(key) is not None} for pfile in files]
+
+
+def gzipped(body):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as gzip_file:
+        gzip_file.write(body)
+    return buf.getvalue()
+
+
+class FakeRaw(object):
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, amt, decode_content):
+        assert not decode_content
+        return iter(chunked(self.body, amt))
+
+
+class FakeResponse(object):
+    def __init__(self, body, chunk_size=1, links=None, status=200,
+                 headers=None):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.links = links or {}
+        self.status = status
+        self.headers = headers or {}
+        self.raw = FakeRaw(body)
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(chunked(self.body, self.chunk_size))
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise IOError(self.status)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession(object):
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return self.pages[url]
+
+
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+@pytest.mark.parametrize('indent', [None, 2])
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 64, 100000])
+def test_objects_match_json_loads(ensure_ascii, indent, size):
+    text = json.dumps(FILES, ensure_ascii=ensure_ascii, indent=indent)
+
+    assert (list(JSONStream(chunked(text, size)).objects(FIELDS)) ==
+            wanted(json.loads(text)))
+
+
+@pytest.mark.parametrize('text', ['[]', ' [ ] ', '\n[\n]\n'])
+def test_empty_array(text):
+    assert list(JSONStream(chunked(text, 1)).objects(FIELDS)) == []
+
+
+def test_split_utf8_and_escapes():
+    body = json.dumps(FILES, ensure_ascii=False).encode('utf-8')
+    response = FakeResponse(body, chunk_size=1)
+
+    assert (list(JSONStream(iter_text(response)).objects(FIELDS)) ==
+            wanted(FILES))
+
+
+def test_gzip_output_is_capped_per_chunk():
+    body = json.dumps([{'filename': 'big.txt', 'patch': 'x' * 10 ** 6}] +
+                      FILES).encode('utf-8')
+    response = FakeResponse(gzipped(body),
+                            headers={'Content-Encoding': 'gzip'})
+
+    chunks = list(iter_bytes(response, 1024))
+
+    assert b''.join(chunks) == body
+    assert max(len(chunk) for chunk in chunks) <= 1024
+    assert (list(JSONStream(iter_text(response, 1024)).objects(FIELDS)) ==
+            [{'filename': 'big.txt'}] + wanted(FILES))
+
+
+def test_null_field_does_not_buffer_rest_of_response():
+    consumed = []
+
+    def chunks():
+        for chunk in ['[{"filename": "a", "previous_filename": null},',
+                      '{"filename": "b"}', ']']:
+            consumed.append(chunk)
+            yield chunk
+
+    objects = JSONStream(chunks()).objects(FIELDS)
+
+    assert next(objects) == {'filename': 'a'}
+    assert len(consumed) == 1
+    assert list(objects) == [{'filename': 'b'}]
+
+
+def test_non_string_key_raises():
+    with pytest.raises(ValueError) as excinfo:
+        list(JSONStream(['[{1: "a"}]']).objects(FIELDS))
+
+    assert 'Expected a string' in str(excinfo.value)
+
+
+def test_unterminated_input_raises():
+    with pytest.raises(ValueError):
+        list(JSONStream(['[{"filename": "a", "patch": "abc']).objects(FIELDS))
+
+
+def test_iter_pull_filenames_follows_pages():
+    first_url = 'https://api.github.com/repos/owner/repo/pulls/7/files'
+    next_url = first_url + '?per_page=100&page=2'
+    first = FakeResponse(
+        json.dumps([
+            {'filename': 'a.py', 'patch': 'x' * 100},
+            {'filename': 'new/b.py', 'previous_filename': 'old/b.py'},
+        ]).encode('utf-8'),
+        chunk_size=7, links={'next': {'url': next_url}})
+    second = FakeResponse(
+        json.dumps([
+            {'filename': 'new/c.py', 'previous_filename': 'old/c.py'},
+        ]).encode('utf-8'),
+        chunk_size=7)
+    session = FakeSession({first_url: first, next_url: second})
+
+    filenames = list(iter_pull_filenames(session, 'owner', 'repo', 7))
+
+    assert filenames == ['a.py', 'new/b.py', 'old/b.py',
+                         'new/c.py', 'old/c.py']
+    assert [url for url, _ in session.requests] == [first_url, next_url]
+    assert session.requests[0][1]['params'] == {'per_page': 100}
+    assert session.requests[1][1]['params'] is None
+    assert all(kwargs['timeout'] == TIMEOUT for _, kwargs in session.requests)
+    assert first.closed and second.closed
+
+
+def test_iter_pull_filenames_closes_response_on_error():
+    url = 'https://api.github.com/repos/owner/repo/pulls/7/files'
+    response = FakeResponse(b'', status=502)
+    session = FakeSession({url: response})
+
+    with pytest.raises(IOError):
+        list(iter_pull_filenames(session, 'owner', 'repo', 7))
+
+    assert response.closed
@@ -0,0 +1,95 @@
+import re
+
+import pytest
+
+from bench_rules import reference_labels
+import rules
+from rules import compile_patterns, evaluate_labels
+
+FILES = ['db/schema.rb', 'app/assets/stylesheets/global/main.css',
+         'test/models_test.rb', 'test/unit/deep_test.rb', 'README.md']
+
+CONFIGS = {
+    'glob string': {
+        'file_pattern_labels': {'db_review': 'db/*', 'no_match': 'lib/*'},
+    },
+    'glob list': {
+        'file_pattern_labels': {
+            'ops_review': ['config/nginx/*', 'app/assets/*/global/*'],
+            'no_match': ['config/*', '*.py'],
+        },
+    },
+    'compiled regex': {
+        'file_pattern_labels': {
+            'test_review': [re.compile(r'test\/[a-z_]+.rb')],
+            'no_match': [re.compile(r'lib/.*')],
+        },
+    },
+    'mixed': {
+        'file_pattern_labels': {
+            'mixed': ['lib/*', re.compile(r'README\.md$')],
+            'mixed_no_match': [re.compile(r'readme'), 'docs/*'],
+        },
+    },
+    'shared label names': {
+        'team_labels': {'shared': ['balloob'], 'team_only': ['balloob']},
+        'file_pattern_labels': {'shared_file': 'db/*', 'no_match': 'lib/*'},
+        'base_branch_labels': {'shared': 'release/*',
+                               'shared_file': 'release/*'},
+        'head_branch_labels': {'team_only': 'feature/*',
+                               'no_match': 'feature/*'},
+    },
+}
+
+BRANCHES = [('release/78', 'feature/fix-X'), ('master', 'bugfix/fix-Y')]
+AUTHORS = ['balloob', 'outsider']
+
+
+def make_config(overrides):
+    repo_config = {
+        'team_labels': {'#Awesome': ['balloob', 'balloobbot'],
+                        'TeamMOM': ['farcy']},
+        'file_pattern_labels': {},
+        'base_branch_labels': {'release': 'release/*'},
+        'head_branch_labels': {'feature': 'feature/*'},
+    }
+    repo_config.update(overrides)
+    return repo_config
+
+
+@pytest.mark.parametrize('name', sorted(CONFIGS))
+@pytest.mark.parametrize('branches', BRANCHES)
+@pytest.mark.parametrize('author', AUTHORS)
+def test_matches_reference(name, branches, author):
+    args = (make_config(CONFIGS[name]), author, FILES) + branches
+
+    assert evaluate_labels(*args) == reference_labels(*args)
+
+
+def test_outsider_and_other_branches_get_no_labels():
+    repo_config = make_config(CONFIGS['shared label names'])
+
+    label_tests = evaluate_labels(repo_config, 'outsider', ['docs/x.md'],
+                                  'master', 'bugfix/fix-Y')
+
+    assert not any(label_tests.values())
+
+
+def test_branch_label_keeps_label_set_by_team_or_file():
+    repo_config = make_config(CONFIGS['shared label names'])
+
+    label_tests = evaluate_labels(repo_config, 'balloob', FILES,
+                                  'master', 'bugfix/fix-Y')
+
+    assert label_tests['shared']
+    assert label_tests['team_only']
+    assert label_tests['shared_file']
+    assert not label_tests['no_match']
+
+
+def test_glob_matchers_are_cached():
+    first = compile_patterns(['cache/test/*', re.compile(r'x')])
+    second = compile_patterns('cache/test/*')
+
+    assert first[0] is second[0]
+    assert rules.GLOB_MATCHERS['cache/test/*'] is first[0]